@@ -0,0 +1,97 @@
+import sys
+import json
+import socket
+import argparse
+from typing import Any, Dict
+
+import paths
+
+
+def send_request(
+    request: Dict[str, Any], socket_path: str = paths.build_server_socket_path
+) -> Dict[str, Any]:
+    """
+    Sends a request to the build server and returns its response.
+
+    Args:
+        request (Dict[str, Any]): The request, with a "command" of "build",
+            "status" or "shutdown". Build requests may set "datasets",
+            "variants", "resolutions", "lite" and "lite_seed".
+        socket_path (str): The Unix socket of the build server.
+
+    Returns:
+        Dict[str, Any]: The response of the server.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as stream:
+            stream.write((json.dumps(request) + "\n").encode("utf-8"))
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+def positive_int(value: str) -> int:
+    """Parses a command line argument that must be an integer of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected an integer >= 1, got {value}")
+    return number
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Send a request to the build server. Only depends on the "
+        "standard library, so that it starts quickly."
+    )
+    parser.add_argument(
+        "command", choices=["build", "status", "shutdown"], help="Request to send."
+    )
+    parser.add_argument("--datasets", nargs="+", default=None, help="Datasets to build.")
+    parser.add_argument("--variants", nargs="+", default=None, help="Variants to build.")
+    # Keep in sync with `resample.RESOLUTIONS`, which is not imported so that
+    # the client only depends on the standard library
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        choices=["hourly", "daily"],
+        default=None,
+        help="Coarser resolutions to build.",
+    )
+    parser.add_argument(
+        "--lite", type=positive_int, default=None, metavar="K", help="Build lite variants."
+    )
+    parser.add_argument("--lite-seed", type=int, default=42, help="Lite selection seed.")
+    parser.add_argument(
+        "--socket", default=paths.build_server_socket_path, help="Unix socket path."
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print the build log of the server."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    request = {"command": args.command}
+    if args.command == "build":
+        request.update(
+            datasets=args.datasets,
+            variants=args.variants,
+            resolutions=args.resolutions,
+            lite=args.lite,
+            lite_seed=args.lite_seed,
+        )
+    try:
+        response = send_request(request, args.socket)
+    except (ConnectionRefusedError, FileNotFoundError):
+        sys.exit(f"No build server is running on {args.socket}")
+
+    if response["status"] != "ok":
+        print(response.get("traceback") or response["error"], file=sys.stderr)
+        sys.exit(1)
+    if args.verbose and "log" in response:
+        print(response["log"], end="")
+    if args.command == "build":
+        print(f"Built {len(response['variants'])} variants in {response['seconds']}s")
+    else:
+        print(json.dumps({k: v for k, v in response.items() if k != "status"}, indent=2))
@@ -0,0 +1,219 @@
+import io
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import traceback
+import socketserver
+from contextlib import redirect_stdout
+from typing import Any, Dict
+
+import paths
+import resample
+import create_train_test_key_files
+from run_all import run_all, load_main_dataset, get_cache_key
+from utils import find_dataset_path
+
+
+def get_dataset_fingerprint(dataset_row) -> str:
+    """
+    Returns a fingerprint of the inputs of a processed dataset: the raw file's
+    path, size and modification time, and the dataset's row in the config.
+    """
+    raw_path = find_dataset_path(dataset_row["name"], paths.raw_datasets_path)
+    stat = os.stat(raw_path)
+    return json.dumps(
+        [raw_path, stat.st_mtime_ns, stat.st_size, dataset_row.to_dict()],
+        sort_keys=True,
+        default=str,
+    )
+
+
+class ResidentDatasets:
+    """
+    Processed datasets kept in memory between builds.
+
+    At most one full and one lite version of each dataset are kept: loading a
+    lite version with another number of series or seed replaces the previous
+    one. A dataset is also reloaded when the fingerprint of its raw file or
+    config row changes. The panels and aggregates cached for a replaced
+    dataset are dropped with it.
+    """
+
+    def __init__(self):
+        self.datasets = {}
+        self.num_loads = 0
+
+    def load(self, dataset_row, lite_num_series=None, lite_seed=42):
+        """Returns the dataset, loading it if it is not resident or is stale.
+
+        Has the signature of `run_all.load_main_dataset`.
+        """
+        slot = (dataset_row["name"], lite_num_series is not None)
+        lite_options = (
+            (lite_num_series, lite_seed) if lite_num_series is not None else None
+        )
+        fingerprint = get_dataset_fingerprint(dataset_row)
+        resident = self.datasets.get(slot)
+        if (
+            resident is not None
+            and resident["fingerprint"] == fingerprint
+            and resident["lite_options"] == lite_options
+        ):
+            return resident["dataset"]
+
+        if resident is not None:
+            print("Replacing resident dataset:", resident["dataset"][2])
+            self.invalidate(resident["cache_key"])
+            del self.datasets[slot]
+        loaded = load_main_dataset(dataset_row, lite_num_series, lite_seed)
+        cache_key = get_cache_key(loaded[2], lite_num_series, lite_seed)
+        # Panels and aggregates left from an earlier load under the same key
+        # describe other data, so drop them whenever the dataset is (re)loaded
+        self.invalidate(cache_key)
+        self.datasets[slot] = {
+            "fingerprint": fingerprint,
+            "lite_options": lite_options,
+            "cache_key": cache_key,
+            "dataset": loaded,
+        }
+        self.num_loads += 1
+        return loaded
+
+    @staticmethod
+    def invalidate(cache_key: str) -> None:
+        """Drops the panels and aggregates cached for a dataset at every resolution."""
+        panel_keys = {cache_key} | {
+            f"{cache_key}_{resolution}" for resolution in resample.RESOLUTIONS
+        }
+        panels = create_train_test_key_files.dataset_panels
+        for key in panel_keys & set(panels):
+            del panels[key]
+        for key in list(resample.aggregates_cache):
+            if key[0] == cache_key:
+                del resample.aggregates_cache[key]
+
+    def status(self) -> Dict[str, Any]:
+        resident = []
+        for entry in self.datasets.values():
+            lite_num_series, lite_seed = entry["lite_options"] or (None, None)
+            resident.append(
+                {
+                    "dataset": entry["dataset"][2],
+                    "lite_num_series": lite_num_series,
+                    "lite_seed": lite_seed,
+                }
+            )
+        return {
+            "resident": sorted(resident, key=lambda r: r["dataset"]),
+            "num_loads": self.num_loads,
+            "cached_panels": len(create_train_test_key_files.dataset_panels),
+        }
+
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    """Handles one JSON request per connection and replies with one JSON line."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.handle_request_dict(request)
+        except ValueError as exc:
+            # Invalid requests, e.g. unknown datasets or variants
+            response = {"status": "error", "error": str(exc)}
+        except Exception as exc:
+            response = {
+                "status": "error",
+                "error": str(exc),
+                "traceback": traceback.format_exc(),
+            }
+        self.wfile.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+
+
+class BuildServer(socketserver.UnixStreamServer):
+    """
+    Local build server that keeps processed datasets resident between builds.
+
+    Requests are handled one at a time, so builds never run concurrently.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.resident = ResidentDatasets()
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, BuildRequestHandler)
+
+    def handle_request_dict(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        command = request.get("command")
+        if command == "status":
+            return dict(status="ok", **self.resident.status())
+        if command == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return {"status": "ok"}
+        if command != "build":
+            raise ValueError(f"Error: Unknown command {command!r}")
+
+        start_time = time.time()
+        log = io.StringIO()
+        with redirect_stdout(log):
+            units = run_all(
+                resolutions=request.get("resolutions"),
+                lite_num_series=request.get("lite"),
+                lite_seed=request.get("lite_seed", 42),
+                datasets=request.get("datasets"),
+                variants=request.get("variants"),
+                dataset_loader=self.resident.load,
+                overwrite=True,
+            )
+        return {
+            "status": "ok",
+            "variants": [unit["variant"] for unit in units],
+            "seconds": round(time.time() - start_time, 3),
+            "log": log.getvalue(),
+        }
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """
+    Removes a socket file left behind by a server that is no longer running.
+
+    Raises:
+        RuntimeError: If a server is already listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(f"Error: A build server is already running on {socket_path}")
+
+
+def serve(socket_path: str = paths.build_server_socket_path) -> None:
+    """Runs the build server until it receives a shutdown request."""
+    with BuildServer(socket_path) as server:
+        print("Build server listening on", socket_path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    print("Build server stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a build server that keeps processed datasets in memory."
+    )
+    parser.add_argument(
+        "--socket", default=paths.build_server_socket_path, help="Unix socket path."
+    )
+    serve(parser.parse_args().socket)
@@ -1,11 +1,13 @@
 import os
 import pandas as pd
 from pandas import DataFrame
-from typing import List
+from typing import List, Optional
 from sklearn.preprocessing import StandardScaler
 
 import utils
 import paths
+from panel import DatasetPanel
+from scaling import save_scaling_params
 
 
 def save_train_data(
@@ -106,11 +108,44 @@ def save_test_key_data(
     )
 
 
-from sklearn.preprocessing import StandardScaler
-import pandas as pd
+dataset_panels = {}
+
+
+def get_train_end(
+    series_len: int, fold_num: int, forecast_length: int, kfold_roll_window_size: int
+) -> int:
+    """
+    Returns the number of time steps in the train split of a fold.
+
+    The test split of fold 5 is the last `forecast_length` steps of the series,
+    and each earlier fold is rolled back by `kfold_roll_window_size` steps.
+    """
+    return series_len - (5 - fold_num) * kfold_roll_window_size - forecast_length
 
 
-grouped_datasets = {}
+def get_dataset_panel(
+        dataset: pd.DataFrame,
+        cache_key: str,
+        schema: dict,
+        dataset_cfg: pd.Series,
+    ) -> DatasetPanel:
+    """
+    Returns the series x time panel of the dataset, building it on first use.
+
+    The panel is cached per dataset under `cache_key` so that the time axis is
+    derived once and shared by all the variants of the dataset. The key must
+    identify the data itself (e.g. include the series subset of lite datasets).
+    """
+    if cache_key not in dataset_panels:
+        dataset_panels[cache_key] = DatasetPanel.from_long_df(
+            dataset,
+            id_col=schema["idField"]["name"],
+            time_col=schema["timeField"]["name"],
+            target_col=schema["forecastTarget"]["name"],
+            frequency=dataset_cfg["frequency"],
+        )
+    return dataset_panels[cache_key]
+
 
 def create_train_test_testkey_files_for_dataset(
         fold_num: int,
@@ -119,9 +154,12 @@ def create_train_test_testkey_files_for_dataset(
         schema: dict,
         dataset_cfg: pd.Series,
         save_dir: str,
+        cache_key: Optional[str] = None,
     ) -> None:
     """
     Creates train, test, and test key files for each dataset marked for use in the metadata.
+
+    The dataset panel is cached under `cache_key`, which defaults to `dataset_name`.
     """
 
     if dataset_cfg["use_dataset"] == 0:
@@ -134,45 +172,35 @@ def create_train_test_testkey_files_for_dataset(
     )
     print("Creating train/test files for dataset:", dataset_variant_name)
 
-    if schema["timeField"]["dataType"] != "INT":
-        dataset[schema["timeField"]["name"]] = pd.to_datetime(
-            dataset[schema["timeField"]["name"]]
-        )
-
-    if dataset_name not in grouped_datasets:
-        grouped_datasets[dataset_name] = dataset.groupby(schema["idField"]["name"])
+    panel = get_dataset_panel(dataset, cache_key or dataset_name, schema, dataset_cfg)
 
-    kfold_roll_window_size = dataset_cfg["kfold_roll_window_size"]
-    grouped = grouped_datasets[dataset_name]
-    series_len = grouped.size().iloc[0]
-    train_end = series_len - (5 - fold_num) * kfold_roll_window_size - forecast_length
+    train_end = get_train_end(
+        panel.series_len, fold_num, forecast_length, dataset_cfg["kfold_roll_window_size"]
+    )
+    test_end = train_end + forecast_length
 
-    # Extract the target column for scaling
+    id_col = schema["idField"]["name"]
+    time_col = schema["timeField"]["name"]
     target_col = schema["forecastTarget"]["name"]
 
-    train_dfs = []
-    test_dfs = []
-    for _, group in grouped:
-        # Split the group into train and test sets
-        train_data = group.iloc[:train_end]
-        test_data = group.iloc[train_end:train_end+forecast_length]
-
-        # Apply standard scaling to the target column in train data
-        scaler = StandardScaler()
-        train_target_scaled = scaler.fit_transform(train_data[[target_col]])
-        test_target_scaled = scaler.transform(test_data[[target_col]])
-
-        # Replace the original target column with the scaled values
-        train_data.loc[:, target_col] = train_target_scaled.round(5)
-        test_data.loc[:, target_col] = test_target_scaled.round(5)
-
-        # Append the scaled data to the list
-        train_dfs.append(train_data)
-        test_dfs.append(test_data)
-
-    # Concatenate all the train and test splits into two DataFrames
-    train_df = pd.concat(train_dfs)
-    test_df = pd.concat(test_dfs)
+    # Apply standard scaling to the target of each series, fitted on its train
+    # data. Series are the columns of the transposed panel, so one scaler fits
+    # all of them at once.
+    scaler = StandardScaler()
+    train_target_scaled = scaler.fit_transform(panel.values[:, :train_end].T).T
+    test_target_scaled = scaler.transform(panel.values[:, train_end:test_end].T).T
+    save_scaling_params(
+        panel.series_ids, scaler.mean_, scaler.scale_, dataset_variant_name, save_dir
+    )
+
+    train_df = panel.to_long_df(
+        id_col, time_col, target_col, 0, train_end,
+        values=train_target_scaled.round(5),
+    )
+    test_df = panel.to_long_df(
+        id_col, time_col, target_col, train_end, test_end,
+        values=test_target_scaled.round(5),
+    )
 
     # Save train/test data
     save_train_data(train_df, dataset_variant_name, save_dir, compression="")
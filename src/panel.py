@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from time_axis import TimeAxis
+
+
+class DatasetPanel:
+    """
+    A dataset held as a series x time matrix of target values sharing one time axis.
+
+    Attributes:
+        series_ids (np.ndarray): The series ids, sorted, one per row of `values`.
+        values (np.ndarray): The target values with shape (num_series, series_len).
+        time_axis (TimeAxis): The time axis shared by all series.
+    """
+
+    def __init__(self, series_ids: np.ndarray, values: np.ndarray, time_axis: TimeAxis):
+        if values.shape != (len(series_ids), len(time_axis)):
+            raise ValueError(
+                f"Error: Panel values of shape {values.shape} do not match "
+                f"{len(series_ids)} series and {len(time_axis)} time steps"
+            )
+        self.series_ids = np.asarray(series_ids, dtype=object)
+        self.values = values
+        self.time_axis = time_axis
+
+    @classmethod
+    def from_long_df(
+        cls,
+        dataset: pd.DataFrame,
+        id_col: str,
+        time_col: str,
+        target_col: str,
+        frequency: str = "OTHER",
+    ) -> "DatasetPanel":
+        """
+        Builds the panel from a long dataset with one row per series and time step.
+
+        Every series must have the same timestamps. Series are ordered by id, and
+        within each series the row order of the dataset is kept.
+
+        Args:
+            dataset (pd.DataFrame): The long dataset.
+            id_col (str): The name of the id column.
+            time_col (str): The name of the time column.
+            target_col (str): The name of the target column.
+            frequency (str): The `frequency` value from the datasets config.
+
+        Returns:
+            DatasetPanel: The panel.
+        """
+        extra_cols = set(dataset.columns) - {id_col, time_col, target_col}
+        if extra_cols:
+            raise ValueError(
+                f"Error: Covariate columns are not supported in a panel: {sorted(extra_cols)}"
+            )
+        ids = dataset[id_col]
+        if (
+            isinstance(ids.dtype, pd.CategoricalDtype)
+            and ids.cat.categories.is_monotonic_increasing
+        ):
+            codes = ids.cat.codes.to_numpy()
+            series_ids = ids.cat.categories.to_numpy()
+            if (codes < 0).any():
+                raise ValueError(f"Error: Missing values in id column {id_col}")
+        else:
+            codes, series_ids = pd.factorize(ids, sort=True)
+            series_ids = np.asarray(series_ids)
+        num_series = len(series_ids)
+        counts = np.bincount(codes, minlength=num_series)
+        if num_series == 0 or (counts != counts[0]).any():
+            raise ValueError("Error: All series must have the same number of time steps")
+        series_len = int(counts[0])
+
+        order = np.argsort(codes, kind="stable")
+        if (order == np.arange(len(order))).all():
+            order = slice(None)
+        values = dataset[target_col].to_numpy()[order].reshape(num_series, series_len)
+        timestamps = dataset[time_col].to_numpy()[order].reshape(num_series, series_len)
+        if num_series > 1 and (timestamps[1:] != timestamps[0]).any():
+            raise ValueError("Error: All series must share the same timestamps")
+        time_axis = TimeAxis.from_timestamps(timestamps[0], frequency)
+        return cls(series_ids=series_ids, values=values, time_axis=time_axis)
+
+    @property
+    def num_series(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def series_len(self) -> int:
+        return self.values.shape[1]
+
+    def to_long_df(
+        self,
+        id_col: str,
+        time_col: str,
+        target_col: Optional[str],
+        start_idx: int = 0,
+        stop_idx: Optional[int] = None,
+        values: Optional[np.ndarray] = None,
+    ) -> pd.DataFrame:
+        """
+        Returns the time steps `start_idx` to `stop_idx` of the panel in long format.
+
+        Args:
+            id_col (str): The name of the id column.
+            time_col (str): The name of the time column.
+            target_col (Optional[str]): The name of the target column. If None,
+                the target column is left out.
+            start_idx (int): The first time step.
+            stop_idx (Optional[int]): The time step to stop at (exclusive).
+            values (Optional[np.ndarray]): Values to use for the target column instead
+                of the panel values, with shape (num_series, stop_idx - start_idx).
+
+        Returns:
+            pd.DataFrame: The long dataset with columns time, id and target.
+        """
+        if stop_idx is None:
+            stop_idx = self.series_len
+        num_steps = stop_idx - start_idx
+        columns = {
+            time_col: np.tile(self.time_axis.timestamps(start_idx, stop_idx), self.num_series),
+            id_col: np.repeat(self.series_ids, num_steps),
+        }
+        if target_col is not None:
+            if values is None:
+                values = self.values[:, start_idx:stop_idx]
+            columns[target_col] = values.reshape(-1)
+        return pd.DataFrame(columns)
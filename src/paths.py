@@ -6,3 +6,6 @@ dataset_cfg_path = os.path.join(ROOT_DIR, "src/config/forecasting_datasets.csv")
 features_cfg_path = os.path.join(ROOT_DIR, "src/config/forecasting_datasets_fields.csv")
 raw_datasets_path = os.path.join(ROOT_DIR, "datasets/raw/")
 processed_datasets_path = os.path.join(ROOT_DIR, "datasets/processed/")
+profiles_path = os.path.join(ROOT_DIR, "datasets/profiles/")
+readme_path = os.path.join(ROOT_DIR, "README.md")
+build_server_socket_path = os.path.join(ROOT_DIR, ".build_server.sock")
@@ -1,8 +1,17 @@
 import os
+import numpy as np
 import pandas as pd
+from typing import List, Optional, Tuple
 
 import paths
-from utils import load_dataset
+from utils import load_dataset, load_dataset_columns
+
+
+def get_usecols(series: Optional[List[str]]) -> Optional[List[str]]:
+    """Returns the raw columns to read for the given series, or None for all."""
+    if series is None:
+        return None
+    return ["date"] + list(series)
 
 
 def preprocess_and_unpivot_dataset(dataset: pd.DataFrame) -> pd.DataFrame:
@@ -12,10 +21,13 @@ def preprocess_and_unpivot_dataset(dataset: pd.DataFrame) -> pd.DataFrame:
     The preprocessing steps include:
     1. Renaming the "date" column to "dt".
     2. Converting the "dt" column to datetime format.
-    3. Dropping duplicate rows.
+    3. Dropping rows with a duplicated "dt" value (the first occurrence is kept).
 
     The unpivoting step transforms the dataset such that each row contains a single observation,
     with columns for date ("dt"), series identifier ("series_id"), and the observed value ("value").
+    The long columns are built directly from the wide value matrix with repeat/tile rather
+    than `melt`, and "series_id" is stored as a categorical. Rows are ordered series by
+    series, in the column order of the wide dataset, as `melt` would produce them.
 
     Args:
         dataset (pd.DataFrame): The input dataset to preprocess and unpivot.
@@ -23,16 +35,48 @@ def preprocess_and_unpivot_dataset(dataset: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: The preprocessed and unpivoted dataset.
     """
-    dataset.rename(columns={"date": "dt"}, inplace=True)
-    dataset["dt"] = pd.to_datetime(dataset["dt"])
-    dataset = dataset.drop_duplicates()
-    unpivoted = dataset.melt(id_vars=["dt"], var_name="series_id", value_name="value")
+    dataset = dataset.rename(columns={"date": "dt"})
+    dt_values = pd.to_datetime(dataset["dt"]).to_numpy()
+
+    # Sort-based dedupe on the time key; keeps the first row for each timestamp
+    # and the original row order.
+    order = np.argsort(dt_values, kind="stable")
+    sorted_dt = dt_values[order]
+    is_first = np.empty(len(sorted_dt), dtype=bool)
+    is_first[:1] = True
+    is_first[1:] = sorted_dt[1:] != sorted_dt[:-1]
+    keep_idx = np.sort(order[is_first])
+
+    series_names = np.asarray([c for c in dataset.columns if c != "dt"], dtype=object)
+    values = dataset[list(series_names)].to_numpy()
+    if len(keep_idx) != len(values):
+        values = values[keep_idx]
+        dt_values = dt_values[keep_idx]
+    num_steps, num_series = values.shape
+
+    # Categories are sorted so that grouping by series_id yields the same
+    # series order as grouping the previous string column did.
+    category_order = np.argsort(series_names, kind="stable")
+    codes = np.empty(num_series, dtype=np.int32)
+    codes[category_order] = np.arange(num_series, dtype=np.int32)
+    series_id = pd.Categorical.from_codes(
+        np.repeat(codes, num_steps), categories=series_names[category_order]
+    )
+
+    unpivoted = pd.DataFrame(
+        {
+            "dt": np.tile(dt_values, num_series),
+            "series_id": series_id,
+            "value": values.ravel(order="F"),
+        }
+    )
     return unpivoted
 
 
 def get_electricity_or_traffic_dataset(
         dataset_name: str,
-        raw_dir_path: str = os.path.join(paths.raw_datasets_path)
+        raw_dir_path: str = os.path.join(paths.raw_datasets_path),
+        series: Optional[List[str]] = None,
     ):
     """
     Loads, preprocesses, and unpivots the dataset. Also renames certain series for convenience.
@@ -44,11 +88,15 @@ def get_electricity_or_traffic_dataset(
     Args:
         dataset_name (str): The name of the dataset to load.
         raw_dir_path (str): The path to the directory containing the raw dataset.
+        series (Optional[List[str]]): The raw columns of the series to load. Loads
+            all series if None.
 
     Returns:
         pd.DataFrame: The preprocessed and unpivoted electricity dataset.
     """
-    dataset = load_dataset(dataset_name=dataset_name, dir_path=raw_dir_path)
+    dataset = load_dataset(
+        dataset_name=dataset_name, dir_path=raw_dir_path, usecols=get_usecols(series)
+    )
     dataset.columns = [f"ser_{c}" if c != "date" else "date" for c in dataset.columns]
     unpivoted = preprocess_and_unpivot_dataset(dataset)
     return unpivoted
@@ -56,7 +104,8 @@ def get_electricity_or_traffic_dataset(
 
 def get_dataset(
         dataset_name: str,
-        raw_dir_path: str = os.path.join(paths.raw_datasets_path)
+        raw_dir_path: str = os.path.join(paths.raw_datasets_path),
+        series: Optional[List[str]] = None,
     ):
     """
     Loads, preprocesses, and unpivots a generic dataset.
@@ -67,41 +116,118 @@ def get_dataset(
     Args:
         dataset_name (str): The name of the dataset to load.
         raw_dir_path (str): The path to the directory containing the raw dataset.
+        series (Optional[List[str]]): The raw columns of the series to load. Loads
+            all series if None.
 
     Returns:
         pd.DataFrame: The preprocessed and unpivoted dataset.
     """
-    dataset = load_dataset(dataset_name=dataset_name, dir_path=raw_dir_path)
+    dataset = load_dataset(
+        dataset_name=dataset_name, dir_path=raw_dir_path, usecols=get_usecols(series)
+    )
     unpivoted = preprocess_and_unpivot_dataset(dataset)
     return unpivoted
 
 
-def save_dataset(main_dataset_df: pd.DataFrame, dataset_name: str, save_dir: str):
+def save_dataset(
+        main_dataset_df: pd.DataFrame,
+        dataset_name: str,
+        save_dir: str,
+        overwrite: bool = False,
+    ):
     """Save dataset to disk with .gz compression
 
     Args:
         main_dataset_df (pd.DataFrame): The dataset to save
         dataset_name (str): The name of the dataset
         save_dir (str): Datasets directory to save file.
+        overwrite (bool): Overwrite the file if it already exists.
 
     """
     print(f"Saving main file for dataset {dataset_name}...")
     os.makedirs(save_dir, exist_ok=True)
     full_fpath = os.path.join(save_dir, f"{dataset_name}.csv.gz")
-    if not os.path.exists(full_fpath):
+    if overwrite or not os.path.exists(full_fpath):
         main_dataset_df.to_csv(full_fpath, index=False)
 
 
-def get_main_dataset_df(dataset_name):
+def get_main_dataset_df(dataset_name, series=None):
     """Load, process and return dataset
 
     Args:
         dataset_name (_type_): Name of dataset to load
+        series (Optional[List[str]]): Raw columns of the series to load. Loads
+            all series if None.
 
     Returns:
         d.DataFrame): Loaded dataframe
     """
     if dataset_name in ["electricity", "traffic"]:
-        return get_electricity_or_traffic_dataset(dataset_name)
+        return get_electricity_or_traffic_dataset(dataset_name, series=series)
     else:
-        return get_dataset(dataset_name)
+        return get_dataset(dataset_name, series=series)
+
+
+def select_series(series: List[str], num_series: int, seed: int) -> List[str]:
+    """
+    Deterministically selects a subset of series.
+
+    Args:
+        series (List[str]): The names of all the series.
+        num_series (int): The number of series to select. All series are
+            selected if there are no more than this.
+        seed (int): The random seed of the selection.
+
+    Returns:
+        List[str]: The selected series, in their original order.
+
+    Raises:
+        ValueError: If `num_series` is less than 1.
+    """
+    if num_series < 1:
+        raise ValueError(f"Error: Expected at least 1 series, got {num_series}")
+    if num_series >= len(series):
+        return list(series)
+    rng = np.random.default_rng(seed)
+    selected = rng.choice(len(series), size=num_series, replace=False)
+    return [series[i] for i in np.sort(selected)]
+
+
+def get_lite_dataset_df(
+        dataset_cfg: pd.Series,
+        num_series: int,
+        seed: int,
+        raw_dir_path: str = os.path.join(paths.raw_datasets_path),
+    ) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Loads a "lite" version of a dataset with a seeded subset of its series.
+
+    Only the columns of the selected series are kept when reading the raw file,
+    so unpivoting, panel building, scaling and writing the variants scale with
+    `num_series`. The raw file itself is still decompressed and parsed in full,
+    so loading scales with its size, not with `num_series`.
+
+    Args:
+        dataset_cfg (pd.Series): The metadata for the dataset.
+        num_series (int): The number of series to keep.
+        seed (int): The random seed of the series selection.
+        raw_dir_path (str): The path to the directory containing the raw dataset.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.Series]: The processed lite dataset and its metadata.
+    """
+    dataset_name = dataset_cfg["name"]
+    all_series = [
+        c for c in load_dataset_columns(dataset_name, raw_dir_path) if c != "date"
+    ]
+    series = select_series(all_series, num_series, seed)
+    lite_dataset_df = get_main_dataset_df(dataset_name, series=series)
+
+    lite_cfg = dataset_cfg.copy()
+    lite_cfg["title"] = f"{dataset_cfg['title']} Lite"
+    lite_cfg["description"] = (
+        f"{dataset_cfg['description']} This lite version of the dataset contains "
+        f"{len(series)} of the {len(all_series)} series, selected at random "
+        f"with seed {seed}."
+    )
+    return lite_dataset_df, lite_cfg
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, Any
+
+import paths
+from panel import DatasetPanel
+from process_datasets import get_main_dataset_df
+from utils import load_metadata, load_features_config, strip_quotes, JSONEncoder
+
+
+COVARIATE_FIELD_TYPES = {
+    "past_covariate": "num_past_covariates",
+    "future_covariate": "num_future_covariates",
+    "static_covariate": "num_static_covariates",
+}
+
+
+class StreamingSeriesStats:
+    """
+    Per-series statistics accumulated over chunks of time steps.
+
+    Means and variances are combined across chunks with the parallel form of
+    Welford's algorithm, so each value is visited only once. Missing values are
+    counted and otherwise ignored.
+    """
+
+    def __init__(self, num_series: int):
+        self.length = np.zeros(num_series, dtype=np.int64)
+        self.count = np.zeros(num_series, dtype=np.int64)
+        self.mean = np.zeros(num_series)
+        self.m2 = np.zeros(num_series)
+        self.min = np.full(num_series, np.inf)
+        self.max = np.full(num_series, -np.inf)
+
+    def update(self, chunk: np.ndarray) -> None:
+        """
+        Adds a chunk of values with shape (num_series, chunk_len) to the statistics.
+        """
+        chunk = chunk.astype(np.float64, copy=False)
+        observed = ~np.isnan(chunk)
+        chunk_count = observed.sum(axis=1)
+        filled = np.where(observed, chunk, 0.0)
+        has_values = chunk_count > 0
+        chunk_mean = np.divide(
+            filled.sum(axis=1), chunk_count,
+            out=np.zeros(len(chunk_count)), where=has_values,
+        )
+        chunk_m2 = (np.where(observed, chunk - chunk_mean[:, None], 0.0) ** 2).sum(axis=1)
+
+        total = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        weight = np.divide(
+            chunk_count, total, out=np.zeros(len(total)), where=total > 0
+        )
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * weight
+        self.count = total
+        self.length += chunk.shape[1]
+        self.min = np.fmin(self.min, np.where(observed, chunk, np.inf).min(axis=1))
+        self.max = np.fmax(self.max, np.where(observed, chunk, -np.inf).max(axis=1))
+
+    def to_dict(self, series_ids: np.ndarray) -> Dict[str, Dict[str, Any]]:
+        """Returns the statistics of each series keyed by series id."""
+        has_values = self.count > 0
+        variance = np.divide(
+            self.m2, self.count, out=np.full(len(self.count), np.nan), where=has_values
+        )
+        stats = {}
+        for i, series_id in enumerate(series_ids):
+            stats[str(series_id)] = {
+                "length": self.length[i],
+                "num_missing": self.length[i] - self.count[i],
+                "min": self.min[i] if has_values[i] else None,
+                "max": self.max[i] if has_values[i] else None,
+                "mean": self.mean[i] if has_values[i] else None,
+                "std": np.sqrt(variance[i]) if has_values[i] else None,
+            }
+        return stats
+
+
+def profile_panel(panel: DatasetPanel, chunk_len: int = 8192) -> Dict[str, Any]:
+    """
+    Profiles a dataset panel in a single pass over its time steps.
+
+    Args:
+        panel (DatasetPanel): The dataset panel.
+        chunk_len (int): The number of time steps per chunk.
+
+    Returns:
+        Dict[str, Any]: The profile with the series count, series length, time
+        axis regularity and per-series statistics.
+    """
+    stats = StreamingSeriesStats(panel.num_series)
+    for start_idx in range(0, panel.series_len, chunk_len):
+        stats.update(panel.values[:, start_idx:start_idx + chunk_len])
+    return {
+        "num_series": panel.num_series,
+        "series_length": panel.series_len,
+        "num_missing": int((stats.length - stats.count).sum()),
+        "time_axis": panel.time_axis.to_dict(),
+        "series": stats.to_dict(panel.series_ids),
+    }
+
+
+def count_covariates(dataset_name: str, features_config: pd.DataFrame) -> Dict[str, int]:
+    """
+    Counts the covariates of each type configured for the dataset.
+
+    Args:
+        dataset_name (str): The name of the dataset.
+        features_config (pd.DataFrame): The features configuration data.
+
+    Returns:
+        Dict[str, int]: The number of past, future and static covariates.
+    """
+    field_types = features_config.loc[
+        features_config["name"] == dataset_name, "field_type"
+    ]
+    return {
+        key: int((field_types == field_type).sum())
+        for field_type, key in COVARIATE_FIELD_TYPES.items()
+    }
+
+
+def profile_dataset(
+    dataset_row: pd.Series, features_config: pd.DataFrame, save_dir: str
+) -> Dict[str, Any]:
+    """
+    Profiles a dataset and saves the profile as JSON.
+
+    Args:
+        dataset_row (pd.Series): The metadata for the dataset.
+        features_config (pd.DataFrame): The features configuration data.
+        save_dir (str): The directory to save the profile in.
+
+    Returns:
+        Dict[str, Any]: The dataset profile.
+    """
+    dataset_name = dataset_row["name"]
+    print("Profiling dataset:", dataset_name)
+    main_dataset_df = get_main_dataset_df(dataset_name=dataset_name)
+    panel = DatasetPanel.from_long_df(
+        main_dataset_df,
+        id_col="series_id",
+        time_col="dt",
+        target_col="value",
+        frequency=dataset_row["frequency"],
+    )
+    profile = {"name": dataset_name, "title": dataset_row["title"]}
+    profile.update(count_covariates(dataset_name, features_config))
+    profile.update(profile_panel(panel))
+
+    os.makedirs(save_dir, exist_ok=True)
+    output_fpath = os.path.join(save_dir, f"{dataset_name}_profile.json")
+    with open(output_fpath, "w", encoding="utf-8") as file_:
+        json.dump(profile, file_, cls=JSONEncoder, indent=2)
+    return profile
+
+
+def update_readme_tables(readme: str, profile: Dict[str, Any]) -> str:
+    """
+    Updates the summary table row and the characteristics list of a dataset in the README.
+
+    Args:
+        readme (str): The README contents.
+        profile (Dict[str, Any]): The dataset profile.
+
+    Returns:
+        str: The updated README contents.
+    """
+    title = profile["title"]
+    num_series = f"{profile['num_series']:,}"
+    series_length = f"{profile['series_length']:,}"
+
+    lines = readme.split("\n")
+    for i, line in enumerate(lines):
+        cells = line.split("|")
+        if len(cells) == 10 and cells[1].strip() == title:
+            cells[4] = f" {series_length} "
+            cells[5] = f" {num_series} "
+            cells[6] = f" {profile['num_past_covariates']} "
+            cells[7] = f" {profile['num_future_covariates']} "
+            cells[8] = f" {profile['num_static_covariates']} "
+            lines[i] = "|".join(cells)
+    readme = "\n".join(lines)
+
+    section_start = readme.find(f"## {title} - X\n")
+    if section_start == -1:
+        return readme
+    section_end = readme.find("\n## ", section_start + 1)
+    if section_end == -1:
+        section_end = len(readme)
+    section = readme[section_start:section_end]
+    characteristics = {
+        "Number of series": num_series,
+        "Series length": series_length,
+        "Number of past covariates": profile["num_past_covariates"],
+        "Number of future covariates": profile["num_future_covariates"],
+        "Number of static covariates": profile["num_static_covariates"],
+    }
+    for label, value in characteristics.items():
+        section = re.sub(
+            rf"^- {label} = .*$", f"- {label} = {value}", section, flags=re.MULTILINE
+        )
+    return readme[:section_start] + section + readme[section_end:]
+
+
+def run_profiling(
+    dataset_cfg_path: str = paths.dataset_cfg_path,
+    features_cfg_path: str = paths.features_cfg_path,
+    profiles_path: str = paths.profiles_path,
+    readme_path: str = paths.readme_path,
+) -> None:
+    """Profiles each dataset with available raw data and regenerates the README tables."""
+    dataset_metadata = load_metadata(dataset_cfg_path)
+    features_config = load_features_config(features_cfg_path).apply(strip_quotes)
+
+    with open(readme_path, "r", encoding="utf-8") as file_:
+        readme = file_.read()
+
+    for _, dataset_row in dataset_metadata.iterrows():
+        try:
+            profile = profile_dataset(dataset_row, features_config, profiles_path)
+        except FileNotFoundError:
+            print("Skipping dataset with no raw data:", dataset_row["name"])
+            continue
+        readme = update_readme_tables(readme, profile)
+
+    with open(readme_path, "w", encoding="utf-8") as file_:
+        file_.write(readme)
+
+
+if __name__ == "__main__":
+    run_profiling()
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+from panel import DatasetPanel
+from time_axis import TimeAxis
+
+
+# Resolutions that datasets can be aggregated to, with the `frequency` value
+# used in their schemas and their time step.
+RESOLUTIONS = {
+    "hourly": ("HOURLY", np.timedelta64(1, "h")),
+    "daily": ("DAILY", np.timedelta64(1, "D")),
+}
+
+# Per-series sums and counts of observed values on a regular time axis, cached
+# per (dataset name, resolution). The base resolution is cached under None.
+aggregates_cache = {}
+
+
+def to_regular_grid(panel: DatasetPanel) -> Tuple[np.ndarray, np.ndarray, TimeAxis]:
+    """
+    Returns the per-cell sums and counts of the panel on a gap-free time axis.
+
+    Gaps in the time axis become cells with a count of zero, and values sharing
+    a timestamp are summed into the same cell.
+
+    Args:
+        panel (DatasetPanel): The dataset panel.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, TimeAxis]: The sums, the counts, and the
+        regular time axis.
+    """
+    time_axis = panel.time_axis
+    observed = ~np.isnan(panel.values)
+    values = np.where(observed, panel.values, 0.0)
+    if time_axis.is_regular:
+        return values, observed.astype(np.int64), time_axis
+
+    offsets = time_axis.timestamps() - time_axis.start
+    if (offsets % time_axis.step != np.timedelta64(0)).any():
+        raise ValueError("Error: Timestamps are not aligned to the time step")
+    positions = (offsets // time_axis.step).astype(np.int64)
+    grid_len = int(positions.max()) + 1
+    sums = np.zeros((panel.num_series, grid_len))
+    counts = np.zeros((panel.num_series, grid_len), dtype=np.int64)
+    np.add.at(sums, (slice(None), positions), values)
+    np.add.at(counts, (slice(None), positions), observed)
+    return sums, counts, TimeAxis(time_axis.start, time_axis.step, grid_len)
+
+
+def block_reduce(
+    sums: np.ndarray, counts: np.ndarray, time_axis: TimeAxis, step: np.timedelta64
+) -> Tuple[np.ndarray, np.ndarray, TimeAxis]:
+    """
+    Aggregates sums and counts on a regular time axis into blocks of a coarser step.
+
+    Blocks are aligned to multiples of `step` (e.g. midnight for daily blocks).
+    Blocks only partly covered by the time axis, at its start or end, are dropped.
+
+    Args:
+        sums (np.ndarray): Per-cell sums, shape (num_series, len(time_axis)).
+        counts (np.ndarray): Per-cell counts, same shape as `sums`.
+        time_axis (TimeAxis): The regular time axis of the cells.
+        step (np.timedelta64): The step of the blocks, a multiple of the time
+            axis step.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, TimeAxis]: The block sums, block counts,
+        and the time axis of the blocks (labelled by their start).
+    """
+    step = np.timedelta64(step, "ns")
+    factor, remainder = divmod(step, time_axis.step)
+    if remainder != np.timedelta64(0) or factor < 1:
+        raise ValueError(
+            f"Error: Cannot aggregate a {pd.Timedelta(time_axis.step)} time axis "
+            f"to {pd.Timedelta(step)}"
+        )
+    factor = int(factor)
+    epoch = np.datetime64(0, "ns")
+    lead = int(((time_axis.start - epoch) % step) // time_axis.step)
+    num_blocks = (lead + time_axis.length) // factor
+    first_block = 1 if lead > 0 else 0
+    if num_blocks <= first_block:
+        raise ValueError("Error: The time axis does not cover a full block")
+
+    # Cells of the complete blocks, from the start of the first complete block
+    start_cell = first_block * factor - lead
+    stop_cell = num_blocks * factor - lead
+    shape = (sums.shape[0], num_blocks - first_block, factor)
+    block_sums = sums[:, start_cell:stop_cell].reshape(shape).sum(axis=2)
+    block_counts = counts[:, start_cell:stop_cell].reshape(shape).sum(axis=2)
+    block_axis = TimeAxis(
+        start=time_axis.start + start_cell * time_axis.step,
+        step=step,
+        length=num_blocks - first_block,
+    )
+    return block_sums, block_counts, block_axis
+
+
+def get_aggregates(
+    panel: DatasetPanel, dataset_name: str, resolution: str
+) -> Tuple[np.ndarray, np.ndarray, TimeAxis]:
+    """
+    Returns the cached sums and counts of a dataset at a resolution, computing
+    them from the coarsest cached resolution whose step divides the requested one.
+    """
+    cache_key = (dataset_name, resolution)
+    if cache_key in aggregates_cache:
+        return aggregates_cache[cache_key]
+
+    if (dataset_name, None) not in aggregates_cache:
+        aggregates_cache[(dataset_name, None)] = to_regular_grid(panel)
+    _, step = RESOLUTIONS[resolution]
+    step = np.timedelta64(step, "ns")
+    source = aggregates_cache[(dataset_name, None)]
+    for (name, _), aggregates in aggregates_cache.items():
+        source_step = aggregates[2].step
+        if (
+            name == dataset_name
+            and source_step > source[2].step
+            and source_step <= step
+            and step % source_step == np.timedelta64(0)
+        ):
+            source = aggregates
+    aggregates_cache[cache_key] = block_reduce(*source, step)
+    return aggregates_cache[cache_key]
+
+
+def resample_panel(panel: DatasetPanel, dataset_name: str, resolution: str) -> DatasetPanel:
+    """
+    Aggregates a dataset panel to the mean of each block at a coarser resolution.
+
+    Blocks with no observed values are NaN.
+
+    Args:
+        panel (DatasetPanel): The dataset panel.
+        dataset_name (str): The cache key of the dataset.
+        resolution (str): One of the keys of `RESOLUTIONS`.
+
+    Returns:
+        DatasetPanel: The resampled panel.
+    """
+    sums, counts, time_axis = get_aggregates(panel, dataset_name, resolution)
+    means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+    return DatasetPanel(panel.series_ids, means, time_axis)
+
+
+def get_resampled_dataset_cfg(
+    dataset_cfg: pd.Series, resolution: str, base_step: np.timedelta64
+) -> pd.Series:
+    """
+    Returns the metadata for a dataset aggregated to a coarser resolution.
+
+    The frequency is set to that of the resolution, and the k-fold roll window
+    is converted so that it covers the same duration as at the base resolution.
+
+    Args:
+        dataset_cfg (pd.Series): The metadata for the dataset.
+        resolution (str): One of the keys of `RESOLUTIONS`.
+        base_step (np.timedelta64): The time step of the dataset.
+
+    Returns:
+        pd.Series: The metadata for the resampled dataset.
+    """
+    frequency, step = RESOLUTIONS[resolution]
+    window_duration = dataset_cfg["kfold_roll_window_size"] * np.timedelta64(base_step, "ns")
+    resampled_cfg = dataset_cfg.copy()
+    resampled_cfg["title"] = f"{dataset_cfg['title']} {resolution.capitalize()}"
+    resampled_cfg["description"] = (
+        f"{dataset_cfg['description']} This version of the dataset is aggregated "
+        f"to {resolution} means."
+    )
+    resampled_cfg["frequency"] = frequency
+    resampled_cfg["kfold_roll_window_size"] = max(
+        1, int(window_duration // np.timedelta64(step, "ns"))
+    )
+    return resampled_cfg
+
+
+def get_resampled_dataset_df(
+    main_dataset_df: pd.DataFrame,
+    dataset_cfg: pd.Series,
+    resolution: str,
+    dataset_key: Optional[str] = None,
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Aggregates a processed dataset to a coarser resolution.
+
+    Args:
+        main_dataset_df (pd.DataFrame): The processed dataset in long format.
+        dataset_cfg (pd.Series): The metadata for the dataset.
+        resolution (str): One of the keys of `RESOLUTIONS`.
+        dataset_key (Optional[str]): The key to cache the aggregates under.
+            Defaults to the dataset name.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.Series]: The resampled dataset in long format, and
+        its metadata.
+    """
+    panel = DatasetPanel.from_long_df(
+        main_dataset_df,
+        id_col="series_id",
+        time_col="dt",
+        target_col="value",
+        frequency=dataset_cfg["frequency"],
+    )
+    resampled = resample_panel(panel, dataset_key or dataset_cfg["name"], resolution)
+    resampled_cfg = get_resampled_dataset_cfg(
+        dataset_cfg, resolution, panel.time_axis.step
+    )
+    resampled_df = resampled.to_long_df(id_col="series_id", time_col="dt", target_col="value")
+    return resampled_df, resampled_cfg
@@ -1,58 +1,346 @@
 import os
+import argparse
 
-from process_datasets import get_main_dataset_df, save_dataset
+from process_datasets import get_main_dataset_df, get_lite_dataset_df, save_dataset
 from generate_schemas import generate_schema
-from create_train_test_key_files import create_train_test_testkey_files_for_dataset
+from create_train_test_key_files import (
+    create_train_test_testkey_files_for_dataset,
+    get_train_end,
+)
+from resample import RESOLUTIONS, get_resampled_dataset_df
+from sharding import (
+    get_work_units,
+    parse_shard,
+    assign_shards,
+    get_build_options,
+    get_assignment_hash,
+    write_shard_manifest,
+    merge_shard_manifests,
+)
 from utils import load_metadata, load_features_config, strip_quotes
 import paths
 from config.config import FORECAST_LENS
 
 
-def run_all():
+def load_main_dataset(dataset_row, lite_num_series=None, lite_seed=42):
+    """
+    Loads the processed dataset to build variants from.
+
+    Returns:
+        Tuple: The dataset, its metadata, and the key its variants are named
+        after (the dataset name, with a `_lite` suffix for lite datasets).
+    """
+    dataset_name = dataset_row["name"]
+    if lite_num_series is not None:
+        main_dataset_df, main_dataset_cfg = get_lite_dataset_df(
+            dataset_row, num_series=lite_num_series, seed=lite_seed
+        )
+        return main_dataset_df, main_dataset_cfg, f"{dataset_name}_lite"
+    main_dataset_df = get_main_dataset_df(dataset_name=dataset_name)
+    return main_dataset_df, dataset_row, dataset_name
+
+
+def get_cache_key(base_key, lite_num_series=None, lite_seed=42):
+    """
+    Returns the key the panels and aggregates of a dataset are cached under.
+
+    Lite datasets with a different number of series or seed hold different
+    data under the same variant names, so both are part of their key.
+    """
+    if lite_num_series is None:
+        return base_key
+    return f"{base_key}_{lite_num_series}_seed_{lite_seed}"
+
+
+def check_requested_units(units, dataset_metadata, datasets=None, variants=None):
+    """
+    Checks that the requested datasets and variants are part of the build.
+
+    Raises:
+        ValueError: If a name matches no unit of the build. The error tells
+            apart unknown names from variants that need other build options.
+    """
+    errors = []
+    unknown_datasets = sorted(set(datasets or []) - {u["dataset_name"] for u in units})
+    if unknown_datasets:
+        errors.append(f"Unknown or unused datasets: {unknown_datasets}")
+
+    unmatched = sorted(set(variants or []) - {u["variant"] for u in units})
+    if unmatched:
+        other_options = {
+            u["variant"]
+            for lite in (False, True)
+            for u in get_work_units(
+                dataset_metadata, FORECAST_LENS,
+                resolutions=list(RESOLUTIONS), lite=lite,
+            )
+        }
+        unknown_variants = [v for v in unmatched if v not in other_options]
+        other_variants = [v for v in unmatched if v in other_options]
+        if unknown_variants:
+            errors.append(f"Unknown variants: {unknown_variants}")
+        if other_variants:
+            errors.append(
+                f"Variants not built with these --lite/--resolutions options: "
+                f"{other_variants}"
+            )
+    if errors:
+        raise ValueError("Error: " + ". ".join(errors))
+
+
+def run_all(
+    shard: str = None,
+    resolutions: list = None,
+    lite_num_series: int = None,
+    lite_seed: int = 42,
+    datasets: list = None,
+    variants: list = None,
+    dataset_loader=load_main_dataset,
+    overwrite: bool = False,
+):
+    """
+    Generates the main file, schema, and train/test/test key files of every
+    dataset variant.
+
+    Args:
+        shard (str): Build only the work units of one shard, given as "i/N".
+            The shard also writes a partial manifest of the units it built.
+        resolutions (list): Coarser resolutions (keys of `RESOLUTIONS`) to also
+            build each dataset at, in the same pass over the dataset.
+        lite_num_series (int): If given, build "lite" variants named
+            `<dataset>_lite` with this many series, selected at random, instead
+            of the full datasets. Only the selected series are processed, but
+            the raw files are still read in full.
+        lite_seed (int): The random seed of the lite series selection.
+        datasets (list): Build only the variants of these datasets.
+        variants (list): Build only these variants.
+        dataset_loader (Callable): Loads a dataset, with the signature of
+            `load_main_dataset`.
+        overwrite (bool): Overwrite main dataset files that already exist. Those
+            of lite variants are always rewritten.
+
+    Returns:
+        list: The work units that were built.
+    """
+    unknown_resolutions = sorted(set(resolutions or []) - set(RESOLUTIONS))
+    if unknown_resolutions:
+        raise ValueError(
+            f"Error: Unknown resolutions {unknown_resolutions}, "
+            f"expected some of {list(RESOLUTIONS)}"
+        )
     dataset_metadata = load_metadata(paths.dataset_cfg_path)
     features_config = load_features_config(paths.features_cfg_path).apply(strip_quotes)
 
+    units = get_work_units(
+        dataset_metadata, FORECAST_LENS,
+        resolutions=resolutions, lite=lite_num_series is not None,
+    )
+    check_requested_units(units, dataset_metadata, datasets, variants)
+    if datasets is not None:
+        units = [u for u in units if u["dataset_name"] in datasets]
+    if variants is not None:
+        units = [u for u in units if u["variant"] in variants]
+    if shard is not None:
+        shard_index, num_shards = parse_shard(shard)
+        options = get_build_options(num_shards, resolutions, lite_num_series, lite_seed)
+        assignment = assign_shards(
+            units, dataset_metadata, paths.raw_datasets_path, num_shards,
+            num_series=lite_num_series,
+        )
+        assignment_hash = get_assignment_hash(units, assignment, options)
+        units = [u for u, s in zip(units, assignment) if s == shard_index]
+        print(f"Building shard {shard_index}/{num_shards}: {len(units)} variants")
+
     for _, dataset_row in dataset_metadata.iterrows():
         if dataset_row["use_dataset"] == 0:
             continue
         dataset_name = dataset_row["name"]
+        dataset_units = [u for u in units if u["dataset_name"] == dataset_name]
+        if not dataset_units:
+            continue
         print("Processing dataset:", dataset_name)
 
-        main_dataset_df = get_main_dataset_df(dataset_name=dataset_name)
+        main_dataset_df, main_dataset_cfg, base_key = dataset_loader(
+            dataset_row, lite_num_series, lite_seed
+        )
+        base_cache_key = get_cache_key(base_key, lite_num_series, lite_seed)
 
-        for forecast_len in FORECAST_LENS:
-            for fold_num in range(1, 6):
-                dataset_variant_name = (
-                    dataset_name + f"_fcst_len_{forecast_len}"
-                    + f"_fold_{fold_num}"
-                )
-                save_dir = os.path.join(
-                    paths.processed_datasets_path, dataset_variant_name
-                )
-                save_dataset(
-                    dataset_name=dataset_variant_name,
-                    main_dataset_df=main_dataset_df,
-                    save_dir=save_dir,
+        for resolution in [None] + list(RESOLUTIONS):
+            resolution_units = [u for u in dataset_units if u["resolution"] == resolution]
+            if not resolution_units:
+                continue
+            if resolution is None:
+                dataset_key = base_key
+                cache_key = base_cache_key
+                dataset_df, dataset_cfg = main_dataset_df, main_dataset_cfg
+            else:
+                dataset_key = f"{base_key}_{resolution}"
+                cache_key = f"{base_cache_key}_{resolution}"
+                print("Resampling dataset:", dataset_key)
+                dataset_df, dataset_cfg = get_resampled_dataset_df(
+                    main_dataset_df, main_dataset_cfg, resolution,
+                    dataset_key=base_cache_key,
                 )
+            series_len = len(dataset_df) // dataset_df["series_id"].nunique()
 
-                schema = generate_schema(
-                    dataset_variant_name=dataset_variant_name,
-                    dataset=main_dataset_df,
-                    dataset_cfg=dataset_row,
-                    features_config=features_config,
-                    forecast_len=forecast_len,
-                    save_dir=save_dir,
+            for unit in resolution_units:
+                # Lite variants are named without their size and seed, so their
+                # main file is rewritten to match the other files of the build
+                build_variant(
+                    unit, dataset_key, dataset_df, dataset_cfg, features_config,
+                    series_len, overwrite or lite_num_series is not None, cache_key,
                 )
 
-                create_train_test_testkey_files_for_dataset(
-                    fold_num=fold_num,
-                    dataset=main_dataset_df,
-                    dataset_name=dataset_name,
-                    schema=schema,
-                    dataset_cfg=dataset_row,
-                    save_dir=save_dir,
-                )
+    if shard is not None:
+        manifest_path = write_shard_manifest(
+            units, shard_index, num_shards, paths.processed_datasets_path,
+            assignment_hash, options,
+        )
+        print("Saved shard manifest:", manifest_path)
+    return units
+
+
+def build_variant(
+    unit,
+    dataset_key,
+    dataset_df,
+    dataset_cfg,
+    features_config,
+    series_len,
+    overwrite=False,
+    cache_key=None,
+):
+    """Generates the main file, schema, and train/test/test key files of a variant."""
+    forecast_len = unit["forecast_len"]
+    fold_num = unit["fold_num"]
+    dataset_variant_name = unit["variant"]
+
+    train_end = get_train_end(
+        series_len, fold_num, forecast_len, dataset_cfg["kfold_roll_window_size"]
+    )
+    if train_end < forecast_len:
+        print(
+            f"Skipping dataset {dataset_variant_name}: series of length {series_len} "
+            f"are too short for this forecast length and fold"
+        )
+        return
+
+    save_dir = os.path.join(paths.processed_datasets_path, dataset_variant_name)
+    save_dataset(
+        dataset_name=dataset_variant_name,
+        main_dataset_df=dataset_df,
+        save_dir=save_dir,
+        overwrite=overwrite,
+    )
+
+    schema = generate_schema(
+        dataset_variant_name=dataset_variant_name,
+        dataset=dataset_df,
+        dataset_cfg=dataset_cfg,
+        features_config=features_config,
+        forecast_len=forecast_len,
+        save_dir=save_dir,
+    )
+
+    create_train_test_testkey_files_for_dataset(
+        fold_num=fold_num,
+        dataset=dataset_df,
+        dataset_name=dataset_key,
+        schema=schema,
+        dataset_cfg=dataset_cfg,
+        save_dir=save_dir,
+        cache_key=cache_key,
+    )
+
+
+def merge_shards(
+    num_shards: int,
+    resolutions: list = None,
+    lite_num_series: int = None,
+    lite_seed: int = 42,
+):
+    """
+    Validates the manifests of all shards and merges them into one manifest.
+
+    The options must be the ones the shards were built with. The assignment of
+    variants to shards is recomputed from them and must match the shards'.
+    """
+    dataset_metadata = load_metadata(paths.dataset_cfg_path)
+    units = get_work_units(
+        dataset_metadata, FORECAST_LENS,
+        resolutions=resolutions, lite=lite_num_series is not None,
+    )
+    options = get_build_options(num_shards, resolutions, lite_num_series, lite_seed)
+    assignment = assign_shards(
+        units, dataset_metadata, paths.raw_datasets_path, num_shards,
+        num_series=lite_num_series,
+    )
+    manifest_path = merge_shard_manifests(
+        units, num_shards, paths.processed_datasets_path,
+        get_assignment_hash(units, assignment, options), options,
+    )
+    print("Saved merged manifest:", manifest_path)
+
+
+def positive_int(value: str) -> int:
+    """Parses a command line argument that must be an integer of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected an integer >= 1, got {value}")
+    return number
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build all dataset variants.")
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="Build only shard i of N, given as i/N (e.g. 2/4).",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Validate and merge the manifests written by N shards.",
+    )
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        choices=list(RESOLUTIONS),
+        default=None,
+        help="Also build hourly and/or daily aggregates of each dataset.",
+    )
+    parser.add_argument(
+        "--lite",
+        type=positive_int,
+        default=None,
+        metavar="K",
+        help="Build <dataset>_lite variants with K randomly selected series.",
+    )
+    parser.add_argument(
+        "--lite-seed",
+        type=int,
+        default=42,
+        help="Random seed of the lite series selection.",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    run_all()
+    args = parse_arguments()
+    if args.merge_shards is not None:
+        merge_shards(
+            args.merge_shards,
+            resolutions=args.resolutions,
+            lite_num_series=args.lite,
+            lite_seed=args.lite_seed,
+        )
+    else:
+        run_all(
+            shard=args.shard,
+            resolutions=args.resolutions,
+            lite_num_series=args.lite,
+            lite_seed=args.lite_seed,
+        )
@@ -0,0 +1,83 @@
+import os
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+
+def get_scaling_path(dataset_variant_name: str, save_dir: str) -> str:
+    return os.path.join(save_dir, f"{dataset_variant_name}_scaling.npz")
+
+
+def save_scaling_params(
+    series_ids: np.ndarray,
+    mean: np.ndarray,
+    scale: np.ndarray,
+    dataset_variant_name: str,
+    save_dir: str,
+) -> None:
+    """
+    Saves the per-series standard scaling parameters of a dataset variant.
+
+    Args:
+        series_ids (np.ndarray): The series ids.
+        mean (np.ndarray): The mean of the train target of each series.
+        scale (np.ndarray): The scale (standard deviation) of each series.
+        dataset_variant_name (str): The name of the dataset variant.
+        save_dir (str): The path where the processed datasets are saved.
+    """
+    np.savez(
+        get_scaling_path(dataset_variant_name, save_dir),
+        series_ids=np.asarray(series_ids, dtype=str),
+        mean=np.asarray(mean, dtype=np.float64),
+        scale=np.asarray(scale, dtype=np.float64),
+    )
+
+
+def load_scaling_params(dataset_variant_name: str, save_dir: str) -> Dict[str, np.ndarray]:
+    """
+    Loads the per-series scaling parameters of a dataset variant.
+
+    Args:
+        dataset_variant_name (str): The name of the dataset variant.
+        save_dir (str): The path where the processed datasets are saved.
+
+    Returns:
+        Dict[str, np.ndarray]: The `series_ids`, `mean` and `scale` arrays.
+    """
+    with np.load(get_scaling_path(dataset_variant_name, save_dir)) as params:
+        return {key: params[key] for key in ("series_ids", "mean", "scale")}
+
+
+def inverse_transform(
+    forecasts: np.ndarray,
+    dataset_variant_name: str,
+    save_dir: str,
+    series_ids: Optional[Sequence[str]] = None,
+) -> np.ndarray:
+    """
+    Converts a matrix of scaled forecasts of a variant back to original units.
+
+    Args:
+        forecasts (np.ndarray): Scaled forecasts with shape (num_series, horizon).
+        dataset_variant_name (str): The name of the dataset variant.
+        save_dir (str): The path where the processed datasets are saved.
+        series_ids (Optional[Sequence[str]]): The series id of each row of
+            `forecasts`. Defaults to the series order of the variant files.
+
+    Returns:
+        np.ndarray: The forecasts in original units.
+    """
+    params = load_scaling_params(dataset_variant_name, save_dir)
+    mean, scale = params["mean"], params["scale"]
+    if series_ids is not None:
+        positions = {series_id: i for i, series_id in enumerate(params["series_ids"])}
+        missing = [s for s in series_ids if str(s) not in positions]
+        if missing:
+            raise ValueError(f"Error: Unknown series ids for {dataset_variant_name}: {missing}")
+        rows = np.array([positions[str(s)] for s in series_ids], dtype=np.int64)
+        mean, scale = mean[rows], scale[rows]
+    forecasts = np.asarray(forecasts, dtype=np.float64)
+    if forecasts.shape[0] != len(mean):
+        raise ValueError(
+            f"Error: Expected forecasts for {len(mean)} series, got {forecasts.shape[0]}"
+        )
+    return forecasts * scale[:, None] + mean[:, None]
@@ -0,0 +1,404 @@
+import os
+import glob
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import paths
+from utils import load_schema, JSONEncoder
+
+
+class TestKey:
+    """
+    The test key of a dataset variant aligned to a series x horizon matrix.
+
+    Attributes:
+        series_ids (pd.Index): The sorted series ids, one per row of `values`.
+        timestamps (pd.Index): The timestamps of the horizon, one per column.
+        values (np.ndarray): The actual values with shape (num_series, horizon).
+        mase_scale (Optional[np.ndarray]): Per-series in-sample mean absolute
+            error of the seasonal naive forecast, used to scale MASE.
+        key_hash (str): The SHA-256 hash of the test key file.
+    """
+
+    def __init__(
+        self,
+        series_ids: pd.Index,
+        timestamps: pd.Index,
+        values: np.ndarray,
+        mase_scale: Optional[np.ndarray],
+        key_hash: str,
+    ):
+        self.series_ids = series_ids
+        self.timestamps = timestamps
+        self.values = values
+        self.mase_scale = mase_scale
+        self.key_hash = key_hash
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """Returns the SHA-256 hash of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_:
+        for block in iter(lambda: file_.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def to_matrix(
+    df: pd.DataFrame,
+    id_col: str,
+    time_col: str,
+    value_col: str,
+    series_ids: pd.Index,
+    timestamps: pd.Index,
+) -> np.ndarray:
+    """
+    Scatters a long dataset into a series x time matrix indexed by `series_ids`
+    and `timestamps`. Cells with no row are NaN.
+
+    Raises:
+        ValueError: If the dataset has rows for unknown series or timestamps,
+            or more than one row for a cell.
+    """
+    rows = series_ids.get_indexer(df[id_col].astype(str))
+    cols = timestamps.get_indexer(pd.to_datetime(df[time_col]))
+    if (rows < 0).any() or (cols < 0).any():
+        raise ValueError("Error: Found rows for series or timestamps not in the test key")
+    flat_idx = rows * len(timestamps) + cols
+    if len(np.unique(flat_idx)) != len(flat_idx):
+        raise ValueError("Error: Found duplicate rows for a series and timestamp")
+    matrix = np.full((len(series_ids), len(timestamps)), np.nan)
+    matrix.reshape(-1)[flat_idx] = df[value_col].to_numpy(dtype=np.float64)
+    return matrix
+
+
+def compute_mase_scale(
+    train_df: pd.DataFrame,
+    id_col: str,
+    target_col: str,
+    series_ids: pd.Index,
+    seasonality: int = 1,
+) -> np.ndarray:
+    """
+    Computes the per-series in-sample MAE of the seasonal naive forecast.
+
+    Args:
+        train_df (pd.DataFrame): The train data of the variant, ordered by time
+            within each series.
+        id_col (str): The name of the ID column.
+        target_col (str): The name of the target column.
+        series_ids (pd.Index): The series ids of the test key.
+        seasonality (int): The seasonal period of the naive forecast.
+
+    Returns:
+        np.ndarray: The MASE scale of each series.
+    """
+    codes = series_ids.get_indexer(train_df[id_col].astype(str))
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    values = train_df[target_col].to_numpy(dtype=np.float64)[order]
+    abs_diffs = np.abs(values[seasonality:] - values[:-seasonality])
+    same_series = (codes[seasonality:] == codes[:-seasonality]) & (codes[seasonality:] >= 0)
+    valid = same_series & ~np.isnan(abs_diffs)
+    totals = np.bincount(
+        codes[seasonality:][valid], weights=abs_diffs[valid], minlength=len(series_ids)
+    )
+    counts = np.bincount(codes[seasonality:][valid], minlength=len(series_ids))
+    return np.divide(
+        totals, counts, out=np.full(len(series_ids), np.nan), where=counts > 0
+    )
+
+
+def load_test_key(variant_dir: str, variant: str, seasonality: int = 1) -> TestKey:
+    """
+    Loads the test key of a dataset variant, and the MASE scale from its train data.
+
+    Args:
+        variant_dir (str): The directory with the variant files.
+        variant (str): The name of the variant.
+        seasonality (int): The seasonal period for MASE.
+
+    Returns:
+        TestKey: The test key.
+    """
+    schema = load_schema(variant, os.path.dirname(os.path.normpath(variant_dir)))
+    id_col = schema["idField"]["name"]
+    time_col = schema["timeField"]["name"]
+    target_col = schema["forecastTarget"]["name"]
+
+    test_key_path = os.path.join(variant_dir, f"{variant}_test_key.csv")
+    test_key_df = pd.read_csv(test_key_path, dtype={id_col: str})
+    series_ids = pd.Index(np.sort(test_key_df[id_col].unique()))
+    timestamps = pd.Index(np.sort(pd.to_datetime(test_key_df[time_col]).unique()))
+    values = to_matrix(test_key_df, id_col, time_col, target_col, series_ids, timestamps)
+
+    mase_scale = None
+    train_path = os.path.join(variant_dir, f"{variant}_train.csv")
+    if os.path.exists(train_path):
+        train_df = pd.read_csv(
+            train_path, usecols=[id_col, target_col], dtype={id_col: str}
+        )
+        mase_scale = compute_mase_scale(
+            train_df, id_col, target_col, series_ids, seasonality
+        )
+    return TestKey(series_ids, timestamps, values, mase_scale, hash_file(test_key_path))
+
+
+def compute_metrics(
+    actual: np.ndarray, forecast: np.ndarray, mase_scale: Optional[np.ndarray] = None
+) -> Dict[str, float]:
+    """
+    Computes MSE, MAE, MASE and sMAPE of a forecast matrix against the actuals.
+
+    Args:
+        actual (np.ndarray): The actual values, shape (num_series, horizon).
+        forecast (np.ndarray): The forecasts, same shape as `actual`.
+        mase_scale (Optional[np.ndarray]): The MASE scale of each series. MASE
+            is None if not given.
+
+    Returns:
+        Dict[str, float]: The metrics. MASE is the mean of the per-series MASE.
+    """
+    errors = forecast - actual
+    abs_errors = np.abs(errors)
+    denominator = np.abs(actual) + np.abs(forecast)
+    # A term is 0 where actual and forecast are both 0, and stays NaN (so it is
+    # left out of the mean) where either of them is missing
+    smape_terms = np.divide(
+        2.0 * abs_errors, denominator,
+        out=np.where(np.isnan(denominator), np.nan, 0.0), where=denominator > 0,
+    )
+    metrics = {
+        "mse": float(np.nanmean(errors ** 2)),
+        "mae": float(np.nanmean(abs_errors)),
+        "mase": None,
+        "smape": float(100.0 * np.nanmean(smape_terms)),
+    }
+    if mase_scale is not None:
+        valid = mase_scale > 0
+        if valid.any():
+            series_mae = np.nanmean(abs_errors[valid], axis=1)
+            metrics["mase"] = float(np.nanmean(series_mae / mase_scale[valid]))
+    return metrics
+
+
+def score_forecast(
+    test_key: TestKey,
+    forecast_path: str,
+    id_col: str,
+    time_col: str,
+    prediction_col: str,
+) -> Dict[str, float]:
+    """
+    Scores a forecast file against a test key.
+
+    Raises:
+        ValueError: If the forecast does not cover every series and timestamp
+            of the test key.
+    """
+    forecast_df = pd.read_csv(
+        forecast_path, usecols=[id_col, time_col, prediction_col], dtype={id_col: str}
+    )
+    forecast = to_matrix(
+        forecast_df, id_col, time_col, prediction_col,
+        test_key.series_ids, test_key.timestamps,
+    )
+    num_missing = int(np.isnan(forecast).sum() - np.isnan(test_key.values).sum())
+    if num_missing > 0:
+        raise ValueError(f"Error: Forecast {forecast_path} is missing {num_missing} values")
+    return compute_metrics(test_key.values, forecast, test_key.mase_scale)
+
+
+def get_train_hash(variant_dir: str, variant: str) -> str:
+    """Returns the hash of the train file the MASE scale comes from, if any."""
+    train_path = os.path.join(variant_dir, f"{variant}_train.csv")
+    return hash_file(train_path) if os.path.exists(train_path) else "no_train_file"
+
+
+def get_cache_path(
+    cache_dir: str, key_hash: str, train_hash: str, forecast_hash: str, options: str
+) -> str:
+    entry_hash = hashlib.sha256(
+        f"{key_hash}:{train_hash}:{forecast_hash}:{options}".encode("utf-8")
+    ).hexdigest()
+    return os.path.join(cache_dir, f"{entry_hash}.json")
+
+
+def score_variant(
+    variant_dir: str,
+    variant: str,
+    forecast_paths: List[str],
+    prediction_col: str,
+    seasonality: int,
+) -> List[Dict]:
+    """
+    Loads the test key of a variant once and scores each of its forecasts.
+
+    A forecast that cannot be scored gets a result with an `error` message
+    instead of metrics, so that it does not stop the other forecasts.
+    """
+    schema = load_schema(variant, os.path.dirname(os.path.normpath(variant_dir)))
+    test_key = load_test_key(variant_dir, variant, seasonality)
+    results = []
+    for forecast_path in forecast_paths:
+        try:
+            metrics = score_forecast(
+                test_key,
+                forecast_path,
+                schema["idField"]["name"],
+                schema["timeField"]["name"],
+                prediction_col,
+            )
+        except Exception as exc:
+            metrics = {"error": f"{type(exc).__name__}: {exc}"}
+        results.append(dict(metrics, key_hash=test_key.key_hash))
+    return results
+
+
+def score_forecasts(
+    forecasts: Dict[str, List[str]],
+    processed_datasets_path: str = paths.processed_datasets_path,
+    prediction_col: str = "prediction",
+    seasonality: int = 1,
+    num_workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Scores forecast files against the test keys of their dataset variants.
+
+    Scores are cached on disk against the hashes of the test key, train (for
+    the MASE scale) and forecast files, so only new or changed files are scored. Variants with forecasts to
+    score are processed in parallel, each loading its test key once.
+
+    Args:
+        forecasts (Dict[str, List[str]]): Forecast file paths per variant name.
+        processed_datasets_path (str): The directory with the variant folders.
+        prediction_col (str): The name of the forecast column in forecast files.
+        seasonality (int): The seasonal period for MASE.
+        num_workers (Optional[int]): The number of worker processes.
+        cache_dir (Optional[str]): The score cache directory. Defaults to
+            `_score_cache` in `processed_datasets_path`.
+
+    Returns:
+        pd.DataFrame: One row of metrics per forecast file. Files that could
+        not be scored have no metrics and the reason in the `error` column.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(processed_datasets_path, "_score_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    options = f"{prediction_col}:{seasonality}"
+
+    rows = []
+    pending = {}
+    for variant, forecast_paths in sorted(forecasts.items()):
+        variant_dir = os.path.join(processed_datasets_path, variant)
+        key_path = os.path.join(variant_dir, f"{variant}_test_key.csv")
+        key_hash = hash_file(key_path) if os.path.exists(key_path) else None
+        train_hash = get_train_hash(variant_dir, variant)
+        for forecast_path in sorted(forecast_paths):
+            row = {"variant": variant, "forecast_file": forecast_path}
+            if key_hash is None:
+                row["error"] = f"Test key {key_path} not found"
+                rows.append(row)
+                continue
+            cache_path = get_cache_path(
+                cache_dir, key_hash, train_hash, hash_file(forecast_path), options
+            )
+            if os.path.exists(cache_path):
+                with open(cache_path, "r", encoding="utf-8") as file_:
+                    row.update(json.load(file_))
+            else:
+                pending.setdefault(variant, []).append((forecast_path, cache_path))
+            rows.append(row)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {
+                variant: executor.submit(
+                    score_variant,
+                    os.path.join(processed_datasets_path, variant),
+                    variant,
+                    [forecast_path for forecast_path, _ in jobs],
+                    prediction_col,
+                    seasonality,
+                )
+                for variant, jobs in pending.items()
+            }
+            scored = {}
+            for variant, future in futures.items():
+                try:
+                    results = future.result()
+                except Exception as exc:
+                    # The test key or schema of the variant could not be loaded
+                    error = f"{type(exc).__name__}: {exc}"
+                    results = [{"error": error}] * len(pending[variant])
+                for (forecast_path, cache_path), metrics in zip(
+                    pending[variant], results
+                ):
+                    # Failures are not cached, so fixed files are scored again
+                    if "error" not in metrics:
+                        with open(cache_path, "w", encoding="utf-8") as file_:
+                            json.dump(metrics, file_, cls=JSONEncoder, indent=2)
+                    scored[forecast_path] = metrics
+        for row in rows:
+            if row["forecast_file"] in scored:
+                row.update(scored[row["forecast_file"]])
+
+    return pd.DataFrame(rows)
+
+
+def find_forecasts(forecasts_dir: str) -> Dict[str, List[str]]:
+    """
+    Finds forecast files laid out as `<forecasts_dir>/<variant>/*.csv`.
+    """
+    forecasts = {}
+    for forecast_path in sorted(glob.glob(os.path.join(forecasts_dir, "*", "*.csv"))):
+        variant = os.path.basename(os.path.dirname(forecast_path))
+        forecasts.setdefault(variant, []).append(forecast_path)
+    return forecasts
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Score forecasts against the test keys of the dataset variants."
+    )
+    parser.add_argument(
+        "forecasts_dir",
+        help="Directory with one folder of forecast CSV files per dataset variant.",
+    )
+    parser.add_argument(
+        "--output", default="scores.csv", help="Path of the output scores CSV."
+    )
+    parser.add_argument(
+        "--prediction-col",
+        default="prediction",
+        help="Name of the forecast column in the forecast files.",
+    )
+    parser.add_argument(
+        "--seasonality", type=int, default=1, help="Seasonal period for MASE."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Number of worker processes."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    scores = score_forecasts(
+        find_forecasts(args.forecasts_dir),
+        prediction_col=args.prediction_col,
+        seasonality=args.seasonality,
+        num_workers=args.workers,
+    )
+    scores.to_csv(args.output, index=False)
+    print(f"Saved scores for {len(scores)} forecasts to {args.output}")
+    if "error" in scores:
+        failed = scores[scores["error"].notna()]
+        for _, row in failed.iterrows():
+            print(f"Could not score {row['forecast_file']}: {row['error']}")
@@ -0,0 +1,384 @@
+import os
+import json
+import math
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from resample import RESOLUTIONS
+from time_axis import infer_step
+from utils import JSONEncoder, find_dataset_path, load_dataset_columns
+
+
+def get_variant_name(dataset_name: str, forecast_len: int, fold_num: int) -> str:
+    """Returns the name of the dataset variant for a forecast length and fold."""
+    return dataset_name + f"_fcst_len_{forecast_len}" + f"_fold_{fold_num}"
+
+
+def get_work_units(
+    dataset_metadata: pd.DataFrame,
+    forecast_lens: List[int],
+    num_folds: int = 5,
+    resolutions: Optional[List[str]] = None,
+    lite: bool = False,
+) -> List[Dict]:
+    """
+    Lists the (dataset, forecast_len, fold) work units of a full build.
+
+    Args:
+        dataset_metadata (pd.DataFrame): The metadata for all the datasets.
+        forecast_lens (List[int]): The forecast lengths.
+        num_folds (int): The number of folds per forecast length.
+        resolutions (Optional[List[str]]): Coarser resolutions to also build
+            each dataset at. A resolution is skipped for datasets whose
+            frequency is already that resolution.
+        lite (bool): Whether the units are for the "lite" versions of the
+            datasets, with a subset of their series.
+
+    Returns:
+        List[Dict]: The work units, in build order.
+    """
+    units = []
+    for _, dataset_row in dataset_metadata.iterrows():
+        if dataset_row["use_dataset"] == 0:
+            continue
+        dataset_resolutions = [None] + [
+            resolution for resolution in resolutions or []
+            if RESOLUTIONS[resolution][0] != dataset_row["frequency"]
+        ]
+        for resolution in dataset_resolutions:
+            dataset_key = dataset_row["name"]
+            if lite:
+                dataset_key += "_lite"
+            if resolution is not None:
+                dataset_key += f"_{resolution}"
+            for forecast_len in forecast_lens:
+                for fold_num in range(1, num_folds + 1):
+                    units.append(
+                        {
+                            "dataset_name": dataset_row["name"],
+                            "resolution": resolution,
+                            "forecast_len": int(forecast_len),
+                            "fold_num": fold_num,
+                            "variant": get_variant_name(
+                                dataset_key, forecast_len, fold_num
+                            ),
+                        }
+                    )
+    return units
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """
+    Parses a shard given as "i/N", with i counted from 1.
+
+    Returns:
+        Tuple[int, int]: The shard index and the number of shards.
+    """
+    try:
+        shard_index, num_shards = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Error: Invalid shard {shard!r}, expected i/N") from None
+    if num_shards < 1 or not 1 <= shard_index <= num_shards:
+        raise ValueError(f"Error: Invalid shard {shard!r}, expected 1 <= i <= N")
+    return shard_index, num_shards
+
+
+def estimate_dataset_cost(
+    dataset_name: str,
+    frequency: str,
+    raw_datasets_path: str,
+    resolution: Optional[str] = None,
+    num_series: Optional[int] = None,
+) -> int:
+    """
+    Estimates the build cost of a dataset, at its own or a coarser resolution
+    and optionally limited to `num_series` series.
+
+    The estimate only depends on the raw file, which every build machine has:
+    its size in bytes, scaled by the share of its series that are kept and by
+    the ratio of its time step to the resolution.
+
+    Raises:
+        FileNotFoundError: If the raw file of the dataset is missing.
+    """
+    raw_path = find_dataset_path(dataset_name, raw_datasets_path)
+    cost = os.path.getsize(raw_path)
+    if num_series is not None:
+        total_series = len(load_dataset_columns(dataset_name, raw_datasets_path)) - 1
+        cost = cost * min(num_series, total_series) // max(total_series, 1)
+    if resolution is not None:
+        dates = pd.to_datetime(
+            pd.read_csv(raw_path, usecols=["date"], nrows=1000)["date"]
+        ).to_numpy()
+        base_step = infer_step(np.diff(dates), frequency)
+        cost = cost * pd.Timedelta(base_step) // pd.Timedelta(RESOLUTIONS[resolution][1])
+    return max(int(cost), 1)
+
+
+def split_units(unit_ids: List[int], costs: List[int], num_parts: int) -> List[List[int]]:
+    """
+    Splits a list of units into `num_parts` contiguous parts of about equal cost.
+
+    Contiguous parts keep the units of a resolution together, so a part only
+    resamples the dataset to the resolutions it builds.
+    """
+    total = sum(costs[i] for i in unit_ids)
+    parts = [[]]
+    cumulative = 0
+    for i in unit_ids:
+        if parts[-1] and len(parts) < num_parts and cumulative >= total * len(parts) / num_parts:
+            parts.append([])
+        parts[-1].append(i)
+        cumulative += costs[i]
+    return parts
+
+
+def assign_shards(
+    units: List[Dict],
+    dataset_metadata: pd.DataFrame,
+    raw_datasets_path: str,
+    num_shards: int,
+    num_series: Optional[int] = None,
+) -> List[int]:
+    """
+    Assigns each work unit to a shard, balancing the estimated cost of the shards.
+
+    Every shard that builds a variant of a dataset has to load it first, so the
+    units of a dataset are kept on one shard when possible. The cost of a unit
+    is the estimated cost of its dataset at its resolution, and loading a
+    dataset costs as much as a unit at its own resolution (see
+    `estimate_dataset_cost`). A dataset that costs more than a shard's share of
+    the total is split into contiguous groups of units, each paying the load.
+    Groups are then placed greedily, most costly first, on the least loaded
+    shard. Ties are broken by variant name and shard index, so every machine
+    with the same raw files computes the same assignment.
+
+    Args:
+        units (List[Dict]): The work units.
+        dataset_metadata (pd.DataFrame): The metadata for all the datasets.
+        raw_datasets_path (str): The directory with the raw dataset files.
+        num_shards (int): The number of shards.
+        num_series (Optional[int]): The number of series of "lite" datasets.
+
+    Returns:
+        List[int]: The shard index (from 1) of each unit.
+    """
+    frequencies = dict(zip(dataset_metadata["name"], dataset_metadata["frequency"]))
+    datasets = sorted(
+        {(unit["dataset_name"], unit["resolution"] or "") for unit in units}
+    )
+    dataset_costs = {
+        (name, resolution): estimate_dataset_cost(
+            name, frequencies[name], raw_datasets_path, resolution or None, num_series
+        )
+        for name, resolution in datasets
+    }
+    costs = [
+        dataset_costs[(unit["dataset_name"], unit["resolution"] or "")]
+        for unit in units
+    ]
+
+    dataset_units = {}
+    for i, unit in enumerate(units):
+        dataset_units.setdefault(unit["dataset_name"], []).append(i)
+    load_costs = {
+        name: estimate_dataset_cost(
+            name, frequencies[name], raw_datasets_path, None, num_series
+        )
+        for name in dataset_units
+    }
+    total_cost = sum(costs) + sum(load_costs.values())
+    shard_share = total_cost / num_shards
+
+    groups = []
+    for name, unit_ids in sorted(dataset_units.items()):
+        dataset_cost = load_costs[name] + sum(costs[i] for i in unit_ids)
+        num_parts = min(len(unit_ids), max(1, math.ceil(dataset_cost / shard_share)))
+        for part in split_units(unit_ids, costs, num_parts):
+            groups.append((load_costs[name] + sum(costs[i] for i in part), part))
+
+    groups.sort(key=lambda group: (-group[0], units[group[1][0]]["variant"]))
+    loads = [0] * num_shards
+    assignment = [0] * len(units)
+    for group_cost, part in groups:
+        shard_pos = min(range(num_shards), key=lambda s: (loads[s], s))
+        loads[shard_pos] += group_cost
+        for i in part:
+            assignment[i] = shard_pos + 1
+    return assignment
+
+
+def get_build_options(
+    num_shards: int,
+    resolutions: Optional[List[str]] = None,
+    lite_num_series: Optional[int] = None,
+    lite_seed: int = 42,
+) -> Dict:
+    """Returns the build options that all the shards of a build must share."""
+    return {
+        "num_shards": num_shards,
+        "resolutions": sorted(resolutions or []),
+        "lite_num_series": lite_num_series,
+        "lite_seed": lite_seed if lite_num_series is not None else None,
+    }
+
+
+def get_assignment_hash(
+    units: List[Dict], assignment: List[int], options: Dict
+) -> str:
+    """
+    Returns a hash of the shard of every unit and of the build options, so that
+    shards built with different assignments or options can be told apart.
+    """
+    payload = json.dumps(
+        {
+            "options": options,
+            "assignment": sorted(
+                [unit["variant"], shard] for unit, shard in zip(units, assignment)
+            ),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_manifests_dir(processed_datasets_path: str) -> str:
+    return os.path.join(processed_datasets_path, "_manifests")
+
+
+def list_variant_files(save_dir: str) -> Dict[str, int]:
+    """Returns the size in bytes of each file in a variant directory."""
+    if not os.path.isdir(save_dir):
+        return {}
+    return {
+        file_name: os.path.getsize(os.path.join(save_dir, file_name))
+        for file_name in sorted(os.listdir(save_dir))
+    }
+
+
+def write_shard_manifest(
+    units: List[Dict],
+    shard_index: int,
+    num_shards: int,
+    processed_datasets_path: str,
+    assignment_hash: str,
+    options: Dict,
+) -> str:
+    """
+    Writes the partial manifest of a shard, listing its units and their files.
+
+    Args:
+        units (List[Dict]): The work units built by the shard.
+        shard_index (int): The index of the shard, from 1.
+        num_shards (int): The number of shards.
+        processed_datasets_path (str): The output tree of the build.
+        assignment_hash (str): The hash of the assignment of all the units of
+            the build to shards (see `get_assignment_hash`).
+        options (Dict): The build options the assignment was computed with.
+
+    Returns:
+        str: The path of the manifest.
+    """
+    manifest = {
+        "shard": shard_index,
+        "num_shards": num_shards,
+        "assignment_hash": assignment_hash,
+        "options": options,
+        "units": [
+            dict(
+                unit,
+                files=list_variant_files(
+                    os.path.join(processed_datasets_path, unit["variant"])
+                ),
+            )
+            for unit in units
+        ],
+    }
+    manifests_dir = get_manifests_dir(processed_datasets_path)
+    os.makedirs(manifests_dir, exist_ok=True)
+    manifest_path = os.path.join(
+        manifests_dir, f"shard_{shard_index}_of_{num_shards}.json"
+    )
+    with open(manifest_path, "w", encoding="utf-8") as file_:
+        json.dump(manifest, file_, cls=JSONEncoder, indent=2)
+    return manifest_path
+
+
+def merge_shard_manifests(
+    expected_units: List[Dict],
+    num_shards: int,
+    processed_datasets_path: str,
+    assignment_hash: str,
+    options: Dict,
+) -> str:
+    """
+    Combines the partial manifests of all shards into `manifest.json` after
+    checking that every shard was built with the expected assignment and
+    options, that every expected unit was built exactly once, and that its
+    files are present with the recorded sizes.
+
+    Args:
+        expected_units (List[Dict]): The work units of the full build.
+        num_shards (int): The number of shards.
+        processed_datasets_path (str): The output tree of the build.
+        assignment_hash (str): The expected hash of the assignment of the units
+            to shards (see `get_assignment_hash`).
+        options (Dict): The expected build options.
+
+    Returns:
+        str: The path of the merged manifest.
+    """
+    manifests_dir = get_manifests_dir(processed_datasets_path)
+    built_units = {}
+    for shard_index in range(1, num_shards + 1):
+        manifest_path = os.path.join(
+            manifests_dir, f"shard_{shard_index}_of_{num_shards}.json"
+        )
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"Error: Missing manifest for shard {shard_index}/{num_shards}")
+        with open(manifest_path, "r", encoding="utf-8") as file_:
+            manifest = json.load(file_)
+        if manifest.get("options") != options:
+            raise ValueError(
+                f"Error: Shard {shard_index}/{num_shards} was built with options "
+                f"{manifest.get('options')}, expected {options}"
+            )
+        if manifest.get("assignment_hash") != assignment_hash:
+            raise ValueError(
+                f"Error: Shard {shard_index}/{num_shards} was built with a different "
+                f"assignment of variants to shards. Check that all machines have "
+                f"the same raw files and config."
+            )
+        for unit in manifest["units"]:
+            if unit["variant"] in built_units:
+                raise ValueError(f"Error: Variant {unit['variant']} built by more than one shard")
+            built_units[unit["variant"]] = unit
+
+    expected_variants = [unit["variant"] for unit in expected_units]
+    missing = [v for v in expected_variants if v not in built_units]
+    unexpected = sorted(set(built_units) - set(expected_variants))
+    if missing or unexpected:
+        raise ValueError(
+            f"Error: Shard manifests do not match the build. "
+            f"Missing: {missing}. Unexpected: {unexpected}."
+        )
+
+    for variant, unit in built_units.items():
+        save_dir = os.path.join(processed_datasets_path, variant)
+        for file_name, size in unit["files"].items():
+            file_path = os.path.join(save_dir, file_name)
+            if not os.path.exists(file_path) or os.path.getsize(file_path) != size:
+                raise ValueError(f"Error: File {file_path} is missing or has changed")
+
+    merged = {
+        "num_shards": num_shards,
+        "assignment_hash": assignment_hash,
+        "options": options,
+        "units": [built_units[variant] for variant in expected_variants],
+    }
+    merged_path = os.path.join(manifests_dir, "manifest.json")
+    with open(merged_path, "w", encoding="utf-8") as file_:
+        json.dump(merged, file_, cls=JSONEncoder, indent=2)
+    return merged_path
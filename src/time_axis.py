@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from typing import Optional, Union
+
+
+# Step implied by the `frequency` column of the datasets config. Datasets with
+# frequency "OTHER" (15-minute ETTm, 10-minute weather) get their step inferred
+# from the timestamps themselves.
+FREQUENCY_STEPS = {
+    "DAILY": np.timedelta64(1, "D"),
+    "HOURLY": np.timedelta64(1, "h"),
+}
+
+SUPPORTED_STEPS = [
+    np.timedelta64(1, "D"),
+    np.timedelta64(1, "h"),
+    np.timedelta64(15, "m"),
+    np.timedelta64(10, "m"),
+]
+
+
+class TimeAxis:
+    """
+    Regular time axis of a dataset, stored as a start timestamp and a step.
+
+    Any position where consecutive timestamps are not exactly one step apart
+    (gaps, or duplicated timestamps) is kept in a small irregularity index, so
+    that the original timestamps can be regenerated exactly with arithmetic
+    instead of being stored row by row.
+
+    Attributes:
+        start (np.datetime64): The first timestamp of the axis.
+        step (np.timedelta64): The regular step between timestamps.
+        length (int): The number of timestamps on the axis.
+        irregular_positions (np.ndarray): Positions `i` at which the distance from
+            timestamp `i - 1` to timestamp `i` differs from `step`.
+        irregular_offsets (np.ndarray): The difference between that distance and
+            `step` for each irregular position (negative for duplicates).
+    """
+
+    def __init__(
+        self,
+        start: np.datetime64,
+        step: np.timedelta64,
+        length: int,
+        irregular_positions: Optional[np.ndarray] = None,
+        irregular_offsets: Optional[np.ndarray] = None,
+    ):
+        self.start = np.datetime64(start, "ns")
+        self.step = np.timedelta64(step, "ns")
+        self.length = int(length)
+        if irregular_positions is None:
+            irregular_positions = np.empty(0, dtype=np.int64)
+            irregular_offsets = np.empty(0, dtype="timedelta64[ns]")
+        self.irregular_positions = np.asarray(irregular_positions, dtype=np.int64)
+        self.irregular_offsets = np.asarray(irregular_offsets, dtype="timedelta64[ns]")
+
+    @classmethod
+    def from_timestamps(
+        cls, timestamps: Union[np.ndarray, pd.Series], frequency: str = "OTHER"
+    ) -> "TimeAxis":
+        """
+        Builds the time axis from the ordered timestamps of a single series.
+
+        Args:
+            timestamps (Union[np.ndarray, pd.Series]): The timestamps. They are
+                parsed with `pd.to_datetime` only if they are not already datetimes.
+            frequency (str): The `frequency` value from the datasets config.
+
+        Returns:
+            TimeAxis: The time axis.
+        """
+        values = np.asarray(timestamps)
+        if not np.issubdtype(values.dtype, np.datetime64):
+            values = pd.to_datetime(values).to_numpy()
+        values = values.astype("datetime64[ns]")
+        if len(values) == 0:
+            raise ValueError("Error: Cannot build a time axis from no timestamps")
+
+        deltas = np.diff(values)
+        step = infer_step(deltas, frequency)
+        irregular = np.flatnonzero(deltas != step)
+        return cls(
+            start=values[0],
+            step=step,
+            length=len(values),
+            irregular_positions=irregular + 1,
+            irregular_offsets=deltas[irregular] - step,
+        )
+
+    @property
+    def is_regular(self) -> bool:
+        """Whether the axis has no gaps or duplicated timestamps."""
+        return len(self.irregular_positions) == 0
+
+    @property
+    def end(self) -> np.datetime64:
+        """The last timestamp of the axis."""
+        return self.timestamps(self.length - 1, self.length)[0]
+
+    def timestamps(self, start_idx: int = 0, stop_idx: Optional[int] = None) -> np.ndarray:
+        """
+        Generates the timestamps at positions `start_idx` to `stop_idx` (exclusive).
+
+        Args:
+            start_idx (int): The first position.
+            stop_idx (Optional[int]): The position to stop at. Defaults to the
+                length of the axis.
+
+        Returns:
+            np.ndarray: A `datetime64[ns]` array of timestamps.
+        """
+        if stop_idx is None:
+            stop_idx = self.length
+        positions = np.arange(start_idx, stop_idx, dtype=np.int64)
+        values = self.start + positions * self.step
+        if not self.is_regular:
+            cumulative_offsets = np.concatenate(
+                [
+                    np.zeros(1, dtype="timedelta64[ns]"),
+                    np.cumsum(self.irregular_offsets),
+                ]
+            )
+            values = values + cumulative_offsets[
+                np.searchsorted(self.irregular_positions, positions, side="right")
+            ]
+        return values
+
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable description of the axis."""
+        return {
+            "start": str(pd.Timestamp(self.start)),
+            "end": str(pd.Timestamp(self.end)),
+            "step": str(pd.Timedelta(self.step)),
+            "length": self.length,
+            "num_gaps": int((self.irregular_offsets > np.timedelta64(0)).sum()),
+            "num_duplicates": int((self.irregular_offsets < np.timedelta64(0)).sum()),
+        }
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __repr__(self) -> str:
+        return (
+            f"TimeAxis(start={pd.Timestamp(self.start)}, "
+            f"step={pd.Timedelta(self.step)}, length={self.length}, "
+            f"irregular={len(self.irregular_positions)})"
+        )
+
+
+def infer_step(deltas: np.ndarray, frequency: str = "OTHER") -> np.timedelta64:
+    """
+    Returns the regular step of a time axis given the deltas between timestamps.
+
+    The step comes from the `frequency` config value when it names one (e.g.
+    "HOURLY"). Otherwise it is the most common delta, which must be one of the
+    supported steps.
+
+    Args:
+        deltas (np.ndarray): Differences between consecutive timestamps.
+        frequency (str): The `frequency` value from the datasets config.
+
+    Returns:
+        np.timedelta64: The step.
+    """
+    if frequency in FREQUENCY_STEPS:
+        return np.timedelta64(FREQUENCY_STEPS[frequency], "ns")
+    if len(deltas) == 0:
+        raise ValueError(
+            f"Error: Cannot infer the step of a single timestamp with frequency {frequency}"
+        )
+    unique_deltas, counts = np.unique(deltas, return_counts=True)
+    step = np.timedelta64(unique_deltas[np.argmax(counts)], "ns")
+    if step not in SUPPORTED_STEPS:
+        raise ValueError(f"Error: Unsupported time step {pd.Timedelta(step)}")
+    return step
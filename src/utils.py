@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 
@@ -53,16 +53,16 @@ def load_features_config(features_cfg_path: str) -> pd.DataFrame:
     return data_features_config
 
 
-def load_dataset(dataset_name: str, dir_path: str) -> pd.DataFrame:
+def find_dataset_path(dataset_name: str, dir_path: str) -> str:
     """
-    Read dataset
+    Find the data file of a dataset
 
     Args:
     dataset_name (str): Name of the dataset.
-    dir_path (str): Path where processed data files are to be saved per dataset.
+    dir_path (str): Path where data files are saved per dataset.
 
     Returns:
-    pd.DataFrame: The data features configuration.
+    str: The path of the dataset file.
     """
     # Base dataset path without extension
     base_dataset_path = os.path.join(dir_path, dataset_name, f"{dataset_name}.csv")
@@ -74,9 +74,17 @@ def load_dataset(dataset_name: str, dir_path: str) -> pd.DataFrame:
     for ext in possible_extensions:
         dataset_path = base_dataset_path + ext
         if os.path.exists(dataset_path):
-            # If the file is found, load it using pandas
-            dataset = pd.read_csv(dataset_path)
-            return dataset
+            return dataset_path
+
+    # Raw files keep the casing of their source (e.g. ETTh1.csv.gz), so fall
+    # back to a case-insensitive match on case-sensitive file systems
+    dataset_dir = os.path.join(dir_path, dataset_name)
+    if os.path.isdir(dataset_dir):
+        file_names = {f.lower(): f for f in os.listdir(dataset_dir)}
+        for ext in possible_extensions:
+            file_name = file_names.get(f"{dataset_name}.csv{ext}".lower())
+            if file_name is not None:
+                return os.path.join(dataset_dir, file_name)
 
     # If no file is found, raise an error
     raise FileNotFoundError(
@@ -84,6 +92,40 @@ def load_dataset(dataset_name: str, dir_path: str) -> pd.DataFrame:
     )
 
 
+def load_dataset(
+    dataset_name: str, dir_path: str, usecols: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Read dataset
+
+    Args:
+    dataset_name (str): Name of the dataset.
+    dir_path (str): Path where processed data files are to be saved per dataset.
+    usecols (Optional[List[str]]): Columns to read. Reads all columns if None.
+
+    Returns:
+    pd.DataFrame: The data features configuration.
+    """
+    dataset_path = find_dataset_path(dataset_name, dir_path)
+    dataset = pd.read_csv(dataset_path, usecols=usecols)
+    return dataset
+
+
+def load_dataset_columns(dataset_name: str, dir_path: str) -> List[str]:
+    """
+    Read the column names of a dataset without reading its rows
+
+    Args:
+    dataset_name (str): Name of the dataset.
+    dir_path (str): Path where data files are saved per dataset.
+
+    Returns:
+    List[str]: The column names.
+    """
+    dataset_path = find_dataset_path(dataset_name, dir_path)
+    return pd.read_csv(dataset_path, nrows=0).columns.tolist()
+
+
 def load_schema(dataset_name: str, processed_datasets_path: str) -> Dict[str, Any]:
     """
     Load and return schema for given dataset.